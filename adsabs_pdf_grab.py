@@ -1,8 +1,198 @@
 import re
 import requests
 import os.path
+import random
+import shutil
+import threading
+import time
+import urllib3
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# the maximum number of DOIs and arXiv IDs to look up in a single ADS API request
+_ADS_BATCH_SIZE = 100
+
+# the number of remaining ADS API requests below which requests are paused until the rate limit resets, and the number of times a rate-limited request is retried
+_ADS_RATE_LIMIT_THRESHOLD = 50
+_ADS_MAX_RETRIES = 3
+
+# regular expressions used to extract the DOI and eprint (arXiv ID) from a BibTeX entry
+_DOI_RE = re.compile(r"doi\s*=\s*\{([^}]+)\}", re.IGNORECASE)
+_EPRINT_RE = re.compile(r"eprint\s*=\s*\{([^}]+)\}", re.IGNORECASE)
+
+# regular expression used to remove the version suffix (e.g. `v2') from an arXiv ID
+_ARXIV_VERSION_RE = re.compile(r"v\d+$", re.IGNORECASE)
+
+def create_session(ads_api_key, max_workers=8, retry=True):
+    """
+    Create a `requests' session which is reused for all requests made to the ADS API and the ADS link gateway, so that connections to these hosts are kept alive across BibTeX entries rather than being re-established for every request.
+
+    Parameters
+    ----------
+    ads_api_key : str
+        A valid ADS API key, which is sent in the authorisation header of every request made with the session.
+    max_workers : int, optional (default = 8)
+        The maximum number of threads that will make requests with the session at once. The connection pool for each host is sized to match, so that no thread has to wait for (or discard) a connection.
+    retry : bool, optional (default = True)
+        If True, then retry requests that fail with connection errors, timeouts, or transient server errors. If False, then never retry requests (e.g. for quick probes, where failing over to the next URL is preferable to retrying).
+
+    Returns
+    -------
+    requests.Session
+        The session with a pooled, retrying adapter mounted for both HTTP and HTTPS.
+    """
+
+    session = requests.Session()
+
+    # retry requests that fail with connection errors, timeouts, or transient server errors (500, 502, 504)
+    # rate-limited (429) and unavailable (503) responses are never retried here, even if they have a `Retry-After' header, since requests to the ADS API retry them with ads_get (which also records their rate limit headers)
+    if retry:
+        retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[500, 502, 504], respect_retry_after_header=False, raise_on_status=False)
+    else:
+        retries = 0
+
+    # pool connections to the ADS hosts
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    session.headers["Authorization"] = "Bearer {}".format(ads_api_key)
+
+    return session
+
+class RateLimiter:
+    """
+    Keep track of the ADS API rate limit, using the `X-RateLimit-Remaining' and `X-RateLimit-Reset' headers of the ADS API responses. A single instance is shared between all threads, so that once the number of remaining requests drops below a threshold, all requests to the ADS API are paused until the rate limit resets.
+
+    Parameters
+    ----------
+    threshold : int, optional (default = 50)
+        The number of remaining requests below which requests are paused.
+
+    Attributes
+    ----------
+    remaining : int or None
+        The number of requests remaining before the rate limit is reached, or None if no ADS API response has been received yet.
+    reset : float or None
+        The time (in seconds since the epoch) at which the rate limit resets, or None if no ADS API response has been received yet.
+    """
+
+    def __init__(self, threshold=_ADS_RATE_LIMIT_THRESHOLD):
+        self.threshold = threshold
+        self.remaining = None
+        self.reset = None
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Pause until the rate limit resets if the number of remaining requests is below the threshold. The lock is held while pausing, so that all other threads also wait.
+        """
+
+        with self._lock:
+            if self.remaining is not None and self.remaining < self.threshold and self.reset is not None:
+                delay = self.reset - time.time()
+                if delay > 0:
+                    print("ADS API rate limit almost reached --- pausing for {:.0f} s.".format(delay))
+                    time.sleep(delay)
+                self.remaining = None
+
+    def update(self, response):
+        """
+        Record the rate limit headers of an ADS API response.
+
+        Parameters
+        ----------
+        response : requests.Response
+            The response from the ADS API.
+        """
+
+        with self._lock:
+            try:
+                if "X-RateLimit-Remaining" in response.headers:
+                    self.remaining = int(response.headers["X-RateLimit-Remaining"])
+                if "X-RateLimit-Reset" in response.headers:
+                    self.reset = float(response.headers["X-RateLimit-Reset"])
+            except ValueError:
+                pass
+
+def ads_get(url, params, session, rate_limiter):
+    """
+    Make a request to the ADS API, pausing first if the rate limit has almost been reached, and retrying up to 3 times (honouring the `Retry-After' header, or else with exponential backoff) if the request is rate-limited (status code 429) or the API is unavailable (status code 503).
+
+    Parameters
+    ----------
+    url : str
+        The ADS API URL to request.
+    params : dict
+        The parameters of the request.
+    session : requests.Session
+        The session (created with create_session) used to query the ADS API.
+    rate_limiter : RateLimiter
+        The rate limiter shared between all requests to the ADS API.
+
+    Returns
+    -------
+    requests.Response
+        The response from the ADS API (after any retries). If the request is still rate-limited or unavailable once the retries have run out, the user is notified and the failed response is returned.
+    """
+
+    for attempt in range(_ADS_MAX_RETRIES + 1):
+        rate_limiter.wait()
+        response = session.get(url, params=params, timeout=(5, 30))
+        rate_limiter.update(response)
+
+        # return the response if it was not rate-limited
+        if response.status_code not in (429, 503):
+            return response
+
+        # if there are no retries left, notify the user of the cause and return the failed response
+        if attempt == _ADS_MAX_RETRIES:
+            if response.status_code == 429:
+                print("ADS API rate limit reached (status code 429) after {} retries --- the entries in this request will be skipped. Try again once the rate limit resets.".format(_ADS_MAX_RETRIES))
+            else:
+                print("ADS API unavailable (status code 503) after {} retries --- the entries in this request will be skipped. Try again later.".format(_ADS_MAX_RETRIES))
+            return response
 
-def download_pdf(url_list, title, output_dir, verbose):
+        # otherwise, wait for as long as the ADS API asks, or back off exponentially (with jitter) if it does not say
+        try:
+            delay = int(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            delay = 2**attempt * 0.5 + random.uniform(0, 0.5)
+        response.close()
+        time.sleep(delay)
+
+def save_response(response, path):
+    """
+    Save the body of a streamed response to a file, copying it in 64 KB chunks directly from the underlying urllib3 response as it is received, so that the full body is never held in memory. The body is only passed through urllib3's decoder if the server has applied a content encoding (i.e. ignored a request for `Accept-Encoding: identity').
+
+    The body is first written to a temporary `.part' file, which is only renamed to `path' once the whole body has been received, so that a failed download never leaves a truncated file behind (which would otherwise be skipped as already downloaded on the next run).
+
+    Parameters
+    ----------
+    response : requests.Response
+        The response, requested with `stream=True'.
+    path : str
+        The path of the file to save the body to.
+    """
+
+    response.raw.decode_content = response.headers.get("Content-Encoding", "identity").lower() != "identity"
+
+    part_path = path + ".part"
+
+    try:
+        with open(part_path, "wb") as file:
+            shutil.copyfileobj(response.raw, file, length=1 << 16)
+        os.replace(part_path, path)
+
+    # if anything goes wrong, remove the partially-downloaded file before passing on the error
+    except BaseException:
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        raise
+
+def download_pdf(url_list, title, output_dir, verbose, session, probe_session=None):
     """
     Request a .pdf file from the first successful URL in a list of URLs and save it to a file with a specified title. If the `verbose' argument is set to True, the user will be notified if the download was successful (including the URL used) or not.
 
@@ -16,41 +206,127 @@ def download_pdf(url_list, title, output_dir, verbose):
         The path to the output directory in which the .pdf files will be downloaded. If no directory is provided, then by default, the current directory is used.
     verbose : bool 
         If True, then print a message when a BibTeX entry has been successfully downloaded (including the URL used). If False, then suppress all output during download. 
+    session : requests.Session
+        The session (created with create_session) used to request the .pdf file.
+    probe_session : requests.Session, optional (default = None)
+        The session (created with create_session with `retry=False') used to probe each URL with a HEAD request before downloading from it. If no session is provided, then `session' is used.
     """
 
     # if `url_list' is None (i.e. something went wrong during the calls to the other functions), then skip the BibTeX entry
     if not url_list:
         return
 
+    if probe_session is None:
+        probe_session = session
+
+    # define the path of the .pdf file once, rather than for every URL
+    out_path = os.path.join(output_dir, "{}.pdf".format(title))
+
     # iterate over the URLs produced by the define_urls function until one of them successfully returns a .pdf file
     for url in url_list:
         try:
-            # request the .pdf file from the defined URL and create the .pdf filename
-            response = requests.get(url)
-            filename = "{}.pdf".format(title)
+            # probe the URL with a HEAD request (with a short timeout) and skip it if it does not lead to a .pdf file, so that dead or stalling URLs fail over quickly to the next URL
+            # the probe is not retried, and servers that do not support HEAD requests (status code 405) are given the benefit of the doubt
+            with probe_session.head(url, timeout=(3, 5), allow_redirects=True) as probe:
+                if probe.status_code != 405 and (probe.status_code != 200 or not probe.headers.get("Content-Type", "").startswith("application/pdf")):
+                    continue
+
+            # request the .pdf file from the defined URL (streaming the body rather than reading it all into memory)
+            # since .pdf files are already compressed, ask for the file without any content encoding so it does not need to be decompressed as it is received
+            response = session.get(url, headers={"Accept-Encoding": "identity"}, stream=True, timeout=(5, 30))
 
-            # check that the request was successful (hence returned status code 200)
-            if response.status_code == 200:
+            try:
+                # check that the request was successful (hence returned status code 200)
+                if response.status_code == 200:
 
-                # save the content of the response as a .pdf file with the name that was previously defined
-                with open("{}/{}".format(output_dir, filename), "wb") as file:
-                    file.write(response.content)
+                    # save the content of the response as a .pdf file at the path that was previously defined
+                    save_response(response, out_path)
 
-                # notify the user that the download was successful
-                if verbose == True:
-                    print("{}.pdf downloaded from {}".format(title, url))
+                    # notify the user that the download was successful
+                    if verbose == True:
+                        print("{}.pdf downloaded from {}".format(title, url))
 
-                # since the download from the current URL was successful, don't attempt to download a file from the other URLs
-                break
+                    # since the download from the current URL was successful, don't attempt to download a file from the other URLs
+                    break
 
-        # if something goes wrong while requesting the .pdf file, then skip the entry and print an error message to notify the user
-        except:
+            # always close the response so that the connection is returned to the session's pool
+            finally:
+                response.close()
+
+        # if something goes wrong while requesting or saving the .pdf file, then skip the URL and print an error message to notify the user
+        # errors raised by urllib3 while the body is being copied (e.g. a dropped connection) are not wrapped by requests, so are caught separately
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError, OSError):
             print("{}.pdf failed.".format(title))
             continue
 
-def define_url(doi=None, eprint=None, ads_api_key=None):
+def _fetch_metadata_batch(dois, eprints, session, rate_limiter):
+    """
+    Use the ADS API to retrieve metadata for a batch of papers in a single request, based on their DOIs and/or arXiv IDs.
+
+    Parameters
+    ----------
+    dois : list
+        The DOIs of the papers.
+    eprints : list
+        The arXiv IDs of the papers.
+    session : requests.Session
+        The session (created with create_session) used to query the ADS API.
+    rate_limiter : RateLimiter
+        The rate limiter shared between all requests to the ADS API.
+
+    Returns
+    -------
+    dict
+        A dictionary mapping each DOI and arXiv ID (as returned by _metadata_key) that was found to the ADS metadata for the paper. Papers are missing from the dictionary if the request was not successful.
+    """
+
+    metadata = {}
+
+    # join all of the DOIs and arXiv IDs into a single ADS query, e.g. doi:"A" OR doi:"B" OR arXiv:"X"
+    # arXiv IDs are stripped of any `arXiv:' prefix and version (as when they are matched to their metadata), and all identifiers are escaped so they can be quoted
+    query = " OR ".join(['doi:"{}"'.format(_escape_query(doi.strip())) for doi in dois] + ['arXiv:"{}"'.format(_escape_query(_normalise_eprint(eprint))) for eprint in eprints])
+    start = 0
+
+    # request the results a page at a time, since a single identifier can match several ADS records (so there may be more results than identifiers in the batch)
+    while True:
+        params = {"q" : query, "fl" : "bibcode,identifier,doi,author,year", "rows" : _ADS_BATCH_SIZE, "start" : start}
+
+        # using the ADS API, request the parameters in the `params' dictionary for all entries in the batch
+        # if the request fails, notify the user and skip the remaining results for the entries in the batch
+        try:
+            response = ads_get('https://api.adsabs.harvard.edu/v1/search/query', params, session, rate_limiter)
+        except requests.exceptions.RequestException as error:
+            print("ADS API request failed ({}) --- skipping the remaining results for a batch of {} DOIs/arXiv IDs.".format(error, len(dois) + len(eprints)))
+            return metadata
+
+        if response.status_code != 200:
+            print("ADS API request failed with status code {} --- skipping the remaining results for a batch of {} DOIs/arXiv IDs.".format(response.status_code, len(dois) + len(eprints)))
+            return metadata
+
+        # parse the response; if it is not in the expected format, notify the user and skip the remaining results for the entries in the batch
+        try:
+            data = response.json()['response']
+            docs, num_found = data['docs'], data['numFound']
+        except (ValueError, KeyError, TypeError) as error:
+            print("ADS API response could not be read ({!r}) --- skipping the remaining results for a batch of {} DOIs/arXiv IDs.".format(error, len(dois) + len(eprints)))
+            return metadata
+
+        # index each paper found by its DOIs and arXiv IDs so it can be matched back to its BibTeX entry
+        for doc in docs:
+            for doi in doc.get('doi', []):
+                metadata[_metadata_key(doi=doi)] = doc
+            for identifier in doc.get('identifier', []):
+                if identifier.lower().startswith("arxiv:"):
+                    metadata[_metadata_key(eprint=identifier)] = doc
+
+        # stop once all of the results have been received
+        start += len(docs)
+        if not docs or start >= num_found:
+            return metadata
+
+def _metadata_key(doi=None, eprint=None):
     """
-    Use the ADS API to retrieve metadata for the bib entry based on the DOI or arXiv ID, and define a list of URLs that contain the .pdf file for the paper and a prefix for the file name of the downloaded .pdf (which is automatically named depending on the number of authors). Note that at least one of either the DOI or arXiv IDs must be passed into the function.
+    Normalise a DOI or arXiv ID into the key used to look up its metadata in the dictionary returned by _fetch_metadata_batch. DOIs are case-insensitive, and arXiv IDs may or may not carry an `arXiv:' prefix or a version.
 
     Parameters
     ----------
@@ -61,63 +337,193 @@ def define_url(doi=None, eprint=None, ads_api_key=None):
 
     Returns
     -------
-    tuple or None
-        A tuple containing a list of URLs at which .pdf files for the paper can be accessed and the formatted prefix for the downloaded .pdf file name, or None if request was not successful.
+    str
+        The normalised key.
     """
 
-    if not ads_api_key:
-        print("Error: you must provide an ADS API key. One can be created by creating or logging into an ADS account and going to the following page: https://ui.adsabs.harvard.edu/user/settings/token")
+    if doi:
+        return "doi:{}".format(doi.strip().lower())
 
-    ads_api_access_header = {"Authorization" : "Bearer {}".format(ads_api_key)}
-        
-    query = None
+    return "arxiv:{}".format(_normalise_eprint(eprint).lower())
 
-    # check if DOI is present in bib entry; if so, use it to find ADS metadata.
-    if 'doi' != None:
-        query="doi:{}".format(doi)
+def _normalise_eprint(eprint):
+    """
+    Remove any surrounding whitespace, `arXiv:' prefix, and version suffix (e.g. `v2') from an arXiv ID, since the identifiers stored by ADS do not include a version.
 
-    # if DOI is not present in bib entry; check if arXiv eprint number is, and if so, use it to find ADS metadata.
-    elif 'eprint' != None:
-        query="arXiv:{}".format(eprint)
+    Parameters
+    ----------
+    eprint : str
+        The arXiv ID of the paper.
 
-    # provided there is either a DOI and/or arXiv number, define a dictionary containing the keys to retrieve from the ADS API
-    if query != None:
-        params = {"q" : query, "fl" : "title,bibcode,identifier,property,author,year", "rows" : 1}
+    Returns
+    -------
+    str
+        The arXiv ID without a prefix or version.
+    """
 
-    # using the ADS API, request the parameters in the `params' dictionary for the entry with the given DOI/arXiv number
-    response = requests.get('https://api.adsabs.harvard.edu/v1/search/query', headers=ads_api_access_header, params=params)
+    eprint = eprint.strip()
+    if eprint.lower().startswith("arxiv:"):
+        eprint = eprint[len("arxiv:"):].strip()
+    return _ARXIV_VERSION_RE.sub("", eprint)
 
-    # if the request was successful (and hence returns status code 200)
-    if response.status_code == 200:
+def _escape_query(value):
+    """
+    Escape backslashes and double quotes in a value, so that it can be placed inside a quoted phrase in an ADS query.
 
-        # parse the response and check that the ADS search found something
-        data = response.json()
-        if data['response']['numFound'] > 0:
+    Parameters
+    ----------
+    value : str
+        The value to escape.
 
-            # access the information about the article, and pull the bibcode
-            doc = data['response']['docs'][0]
-            bibcode = doc['bibcode']
+    Returns
+    -------
+    str
+        The escaped value.
+    """
 
-            # use the bibcode to define URLs to access the .pdf files for the article, in the order of 1) the ADS-hosted .pdf (common for older, scanned papers) 2) the e-print (arXiv) version of the paper 3) the .pdf from the publisher's website.
-            # note that the arXiv version (`EPRINT_PDF') is preferred as there are often problems accessing .pdf files directly from publishers
-            pdf_url = ["https://ui.adsabs.harvard.edu/link_gateway/{}/ADS_PDF".format(bibcode), "https://ui.adsabs.harvard.edu/link_gateway/{}/EPRINT_PDF".format(bibcode), "https://ui.adsabs.harvard.edu/link_gateway/{}/PUB_PDF".format(bibcode)]
+    return value.replace("\\", "\\\\").replace('"', '\\"')
 
-            # depending on the amount of authors, create the name for the .pdf file as [Author]_[Year] (single author), [Author1]_and_[Author2]_[Year] (two authors), or [Author1]_et_al_[year]
-            if len(doc['author']) == 1:
-                paper_name = "{}_{}".format(doc['author'][0].split(",")[0],doc['year'])
-            elif len(doc['author']) == 2:
-                paper_name = "{}_and_{}_{}".format(doc['author'][0].split(",")[0],doc['author'][1].split(",")[0], doc['year'])
-            else:
-                paper_name = "{}_et_al_{}".format(doc['author'][0].split(",")[0], doc['year'])
-            
-            # remove all spaces from .pdf file name
-            paper_name = paper_name.replace(" ","")
-            return pdf_url, paper_name
+def fetch_metadata(id_pairs, session, executor, rate_limiter):
+    """
+    Retrieve the ADS metadata for a list of BibTeX entries, querying the ADS API in batches of up to 100 identifiers (rather than once per entry).
 
-    # If no DOI or arXiv ID was passed into the function, or if the request using the ADS API was unsuccessful, return None.
-    else:
+    Parameters
+    ----------
+    id_pairs : list
+        A list of (DOI, arXiv ID) tuples, as returned by extract_doi_arxiv.
+    session : requests.Session
+        The session (created with create_session) used to query the ADS API.
+    executor : concurrent.futures.Executor
+        The executor used to run the batched requests concurrently.
+    rate_limiter : RateLimiter
+        The rate limiter shared between all requests to the ADS API.
+
+    Returns
+    -------
+    list
+        The ADS metadata for each entry, in the same order as `id_pairs', or None for entries that were not found.
+    """
+
+    # collect the unique DOIs and arXiv IDs across all entries, and split them into batches of (DOIs, arXiv IDs)
+    identifiers = list(dict.fromkeys([("doi", doi) for doi, eprint in id_pairs if doi] + [("eprint", eprint) for doi, eprint in id_pairs if eprint]))
+
+    # if none of the entries have a DOI or arXiv ID, return without making any requests to the ADS API
+    if not identifiers:
+        return [None] * len(id_pairs)
+
+    batches = []
+    for i in range(0, len(identifiers), _ADS_BATCH_SIZE):
+        batch = identifiers[i:i + _ADS_BATCH_SIZE]
+        batches.append(([value for kind, value in batch if kind == "doi"], [value for kind, value in batch if kind == "eprint"]))
+
+    # query the ADS API for each batch and merge the results
+    metadata = {}
+    for batch_metadata in executor.map(lambda batch: _fetch_metadata_batch(batch[0], batch[1], session, rate_limiter), batches):
+        metadata.update(batch_metadata)
+
+    # match each entry with its metadata, preferring the DOI over the arXiv ID
+    # entries with neither a DOI nor an arXiv ID were not included in any of the requests, and are assigned None
+    docs = []
+    for doi, eprint in id_pairs:
+        doc = None
+        if doi:
+            doc = metadata.get(_metadata_key(doi=doi))
+        if doc is None and eprint:
+            doc = metadata.get(_metadata_key(eprint=eprint))
+        docs.append(doc)
+
+    return docs
+
+def define_url(doc):
+    """
+    Define a list of URLs that contain the .pdf file for a paper and a prefix for the file name of the downloaded .pdf (which is automatically named depending on the number of authors), using the ADS metadata for the paper.
+
+    Parameters
+    ----------
+    doc : dict or None
+        The ADS metadata for the paper, as returned by fetch_metadata.
+
+    Returns
+    -------
+    tuple or None
+        A tuple containing a list of URLs at which .pdf files for the paper can be accessed and the formatted prefix for the downloaded .pdf file name, or None if no metadata was found for the paper.
+    """
+
+    # if the paper was not found using the ADS API, return None.
+    if not doc:
         return None
 
+    # pull the bibcode for the article
+    bibcode = doc['bibcode']
+
+    # use the bibcode to define URLs to access the .pdf files for the article, in the order of 1) the ADS-hosted .pdf (common for older, scanned papers) 2) the e-print (arXiv) version of the paper 3) the .pdf from the publisher's website.
+    # note that the arXiv version (`EPRINT_PDF') is preferred as there are often problems accessing .pdf files directly from publishers
+    pdf_url = ["https://ui.adsabs.harvard.edu/link_gateway/{}/ADS_PDF".format(bibcode), "https://ui.adsabs.harvard.edu/link_gateway/{}/EPRINT_PDF".format(bibcode), "https://ui.adsabs.harvard.edu/link_gateway/{}/PUB_PDF".format(bibcode)]
+
+    # depending on the amount of authors, create the name for the .pdf file as [Author]_[Year] (single author), [Author1]_and_[Author2]_[Year] (two authors), or [Author1]_et_al_[year]
+    if len(doc['author']) == 1:
+        paper_name = "{}_{}".format(doc['author'][0].split(",")[0],doc['year'])
+    elif len(doc['author']) == 2:
+        paper_name = "{}_and_{}_{}".format(doc['author'][0].split(",")[0],doc['author'][1].split(",")[0], doc['year'])
+    else:
+        paper_name = "{}_et_al_{}".format(doc['author'][0].split(",")[0], doc['year'])
+    
+    # remove all spaces from .pdf file name
+    paper_name = paper_name.replace(" ","")
+    return pdf_url, paper_name
+
+def iter_bibtex_entries(file):
+    """
+    Read the entries in a BibTeX file line by line, yielding each entry as soon as its closing brace has been read. An entry starts with the first "@" symbol outside of any braces and ends when its braces are balanced, so "@" symbols within field values (e.g. email addresses) do not split entries.
+
+    Parameters
+    ----------
+    file : file object
+        The open .bib file.
+
+    Yields
+    ------
+    str
+        The text of each BibTeX entry, from its "@" symbol to its closing brace.
+    """
+
+    entry = None
+    depth = 0
+
+    for line in file:
+
+        # skip lines between entries that cannot start a new entry, and add whole lines that do not close the current entry
+        if entry is None and "@" not in line:
+            continue
+        if entry is not None and depth > 0 and depth + line.count("{") - line.count("}") > 0:
+            entry.append(line)
+            depth += line.count("{") - line.count("}")
+            continue
+
+        # otherwise, step through the line character by character to find where entries start and end
+        start = 0
+        for position, char in enumerate(line):
+            if entry is None:
+                if char == "@":
+                    entry = []
+                    depth = 0
+                    start = position
+            elif char == "{":
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    entry.append(line[start:position + 1])
+                    yield "".join(entry)
+                    entry = None
+
+        if entry is not None:
+            entry.append(line[start:])
+
+    # yield the final entry even if the file ends before its closing brace
+    if entry:
+        yield "".join(entry)
+
 def extract_doi_arxiv(bibtex_entry):
     """
     Extract the DOI and/or arXiv ID from a BibTeX entry.
@@ -134,8 +540,8 @@ def extract_doi_arxiv(bibtex_entry):
     """
 
     # use regex search to get the DOIs and eprint (arXiv IDs) for the bib entry.
-    doi_match = re.search(r"doi\s*=\s*{([^}]+)}", bibtex_entry, re.IGNORECASE)
-    eprint_match = re.search(r"eprint\s*=\s*{([^}]+)}", bibtex_entry, re.IGNORECASE)
+    doi_match = _DOI_RE.search(bibtex_entry)
+    eprint_match = _EPRINT_RE.search(bibtex_entry)
 
     # if search is successful, store the DOI and arXiv ID in the doi and eprint variables; else, return None
     doi = doi_match.group(1) if doi_match else None
@@ -143,10 +549,9 @@ def extract_doi_arxiv(bibtex_entry):
 
     return doi, eprint
 
-
-def adsabs_pdf_grab(bibtex_file, ads_api_key, output_dir="./", verbose=True, overwrite=False):
+def adsabs_pdf_grab(bibtex_file, ads_api_key, output_dir="./", verbose=True, overwrite=False, max_workers=8):
     """
-    Download a .pdf file for each entry in a BibTeX file by extracting the DOI and arXiv ID for each entry and using this to search the NASA ADS ABS database using the ADS API. In the case that multiple papers from the same author(s) in a given year are requested, these will be downloaded as [Author][Year].pdf, [Author][Year]b.pdf, [Author][Year]c.pdf, [Author][Year]d.pdf, [Author][Year]e.pdf.
+    Download a .pdf file for each entry in a BibTeX file by extracting the DOI and arXiv ID for each entry and using this to search the NASA ADS ABS database using the ADS API. In the case that multiple papers from the same author(s) in a given year are requested, these will be downloaded as [Author][Year].pdf, [Author][Year]b.pdf, [Author][Year]c.pdf, ..., [Author][Year]z.pdf, [Author][Year]_27.pdf, ...
 
     Parameters
     ----------
@@ -160,53 +565,84 @@ def adsabs_pdf_grab(bibtex_file, ads_api_key, output_dir="./", verbose=True, ove
         If True, then print a message when a BibTeX entry has been successfully downloaded (including the URL used). If False, then suppress all output during download. 
     overwrite : bool (default = False)
         If True, then download .pdf files for all BibTeX entries, regardless of if they already exist in the output directory. If False, then skip entries that already have downloaded .pdf files in the output directory.
+    max_workers : int, optional (default = 8)
+        The maximum number of ADS API requests and .pdf downloads to run concurrently.
 
     """
 
-    # open the .bib file and read the content
+    if not ads_api_key:
+        print("Error: you must provide an ADS API key. One can be created by creating or logging into an ADS account and going to the following page: https://ui.adsabs.harvard.edu/user/settings/token")
+        return
+
+    # read the entries in the .bib file one at a time, keeping only their DOI and arXiv IDs
     with open(bibtex_file, "r") as file:
-        content = file.read()
-
-    # separate the entries in the .bib file using the "@" symbol (which each entry starts with in the .bib format) and skip the first empty entry
-    entries = content.split('@')[1:]
-
-    # set up a list for titles to keep track of what has already been processed --- this will be used to check for multiple papers in one year from the same author and name them appropriately (e.g. Holden2024a, Holden2024b, Holden2024c)
-    titles = []
-
-    # iterate over the entries in the .bib file
-    for entry in entries[1:]:
-
-        # get the DOI and arXiv IDs, and pass them into the function to define the .pdf URLs and file names
-        doi, eprint_id = extract_doi_arxiv(entry)
-        pdf_params = define_url(doi=doi, eprint=eprint_id, ads_api_key=ads_api_key)
-
-        # check that the entry was successfully assigned .pdf URLs and file names
-        if pdf_params:
-
-            # check for previously-downloaded papers from the same author in the same year
-            # if so, then append letters at the end of the file name from `b' to `e'.
-            # note that this is done in the order that the entries appear in the .bib file, not publication date.
-            if pdf_params[1]+"d" in titles:
-                pdf_title = pdf_params[1]+"e"
-            elif pdf_params[1]+"c" in titles:
-                pdf_title = pdf_params[1]+"d"
-            elif pdf_params[1]+"b" in titles:
-                pdf_title = pdf_params[1]+"c"
-            elif pdf_params[1] in titles:
-                pdf_title = pdf_params[1]+"b"
-            else:
-                pdf_title = pdf_params[1]
+        id_pairs = [extract_doi_arxiv(entry) for entry in iter_bibtex_entries(file)]
+
+    # create a single session so that connections to the ADS hosts are reused across all entries
+    session = create_session(ads_api_key, max_workers)
+
+    # create a second session, without retries, for probing the .pdf URLs
+    probe_session = create_session(ads_api_key, max_workers, retry=False)
+
+    # keep track of the ADS API rate limit across all threads
+    rate_limiter = RateLimiter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+        # retrieve the ADS metadata for all entries with as few requests as possible
+        docs = fetch_metadata(id_pairs, session, executor, rate_limiter)
+
+        # define the .pdf URLs and file names for all entries; these are in the same order as the entries in the .bib file
+        entry_params = [define_url(doc) for doc in docs]
+
+        # list the .pdf files that already exist in the output directory, so that each entry can be checked without accessing the file system
+        existing = {filename[:-4] for filename in os.listdir(output_dir) if filename.endswith(".pdf")} if os.path.isdir(output_dir) else set()
+
+        # set up a counter of the file names that have already been processed --- this will be used to check for multiple papers in one year from the same author and name them appropriately (e.g. Holden2024, Holden2024b, Holden2024c)
+        base_counts = Counter()
+
+        # set up a set of the bibcodes that have already been processed --- this will be used to skip entries that appear more than once in the .bib file (e.g. with different citation keys), rather than downloading the same paper again under a different file name
+        seen_bibcodes = set()
+
+        # set up a list of (URLs, title) pairs for the entries that need to be downloaded
+        downloads = []
+
+        # iterate over the looked-up entries
+        for doc, pdf_params in zip(docs, entry_params):
+
+            # check that the entry was successfully assigned .pdf URLs and file names, and that the same paper has not already been processed
+            if pdf_params and doc['bibcode'] not in seen_bibcodes:
+
+                seen_bibcodes.add(doc['bibcode'])
+
+                # check for previously-downloaded papers from the same author in the same year
+                # if so, then append letters at the end of the file name from `b' to `z', followed by numbers (e.g. _27, _28) if there are more papers than letters.
+                # note that this is done in the order that the entries appear in the .bib file, not publication date.
+                n = base_counts[pdf_params[1]]
+                if n == 0:
+                    pdf_title = pdf_params[1]
+                elif n < 26:
+                    pdf_title = pdf_params[1] + chr(ord("a") + n)
+                else:
+                    pdf_title = "{}_{}".format(pdf_params[1], n + 1)
+
+                # update the counter to keep track of previously-processed files
+                base_counts[pdf_params[1]] += 1
+
+                # assign the list of .pdf URLs to a new variable for clarity
+                pdf_urls = pdf_params[0]
 
-            # assign the list of .pdf URLs to a new variable for clarity
-            pdf_urls = pdf_params[0]
+                if pdf_title in existing and overwrite is False:
+                    print("{}.pdf exists --- skipping.".format(pdf_title))
+                    continue
 
-            # append the current title to the `titles' list to keep track of previously-processed files
-            titles.append(pdf_title)
+                else:
+                    downloads.append((pdf_urls, pdf_title))
+                    existing.add(pdf_title)
 
-            if os.path.isfile("{}/{}.pdf".format(output_dir, pdf_title)) and overwrite is False:
-                print("{}.pdf exists --- skipping.".format(pdf_title))
-                continue
+        # pass the .pdf URLs and file names into the download_pdf function, downloading the files in parallel
+        list(executor.map(lambda download: download_pdf(download[0], download[1], output_dir, verbose, session, probe_session), downloads))
 
-            else: 
-                # pass the .pdf URLs and file names into the download_pdf function
-                download_pdf(pdf_urls, pdf_title, output_dir, verbose)
+    # close the sessions and release the pooled connections
+    session.close()
+    probe_session.close()